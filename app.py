@@ -4,6 +4,7 @@ import streamlit as st
 from css.st_ui import st_ui_css
 # from dataset import DatasetDocument
 from widgets import load_json_data, display_data_editor
+from indexes import build_identifier_index, build_alert_index
 
 pd.options.mode.chained_assignment = None
 
@@ -13,9 +14,34 @@ st.markdown(st_ui_css, unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------------
 
-def initialize_session_state(data):
-    if 'data' not in st.session_state:
+def initialize_session_state(data, file_name=None):
+    if st.session_state.get('file_name') != file_name:
+        # A different file was loaded, drop the previous file's data and indexes
+        for key in ['data', 'identifier_index', 'identifier_collision_id', 'alert_index']:
+            st.session_state.pop(key, None)
+        st.session_state['file_name'] = file_name
+    if st.session_state.get('data') is None:
         st.session_state['data'] = data
+    data = st.session_state['data']
+    if data is not None:
+        if 'identifier_index' not in st.session_state:
+            initialize_identifier_index(data)
+        if 'alert_index' not in st.session_state:
+            initialize_alert_index(data)
+
+
+def initialize_identifier_index(data):
+    """
+    Builds the identifier index once per loaded file.
+    """
+    st.session_state['identifier_index'] = build_identifier_index(data)
+
+
+def initialize_alert_index(data):
+    """
+    Builds the alert expiration index once per loaded file.
+    """
+    st.session_state['alert_index'] = build_alert_index(data)
 
 
 # def load_data_from_mongo():
@@ -48,7 +74,7 @@ def initialize_session_state(data):
 #             except Exception as e:
 #                 logs.error("Connection failed.")
 #
-#     initialize_session_state(df)
+#     initialize_session_state(df, file_name)
 #     if 'data' in st.session_state and st.session_state['data'] is not None:
 #         df = st.session_state['data']
 #
@@ -68,7 +94,7 @@ def main():
     st.title("JSON Editor")
 
     df, file_name = load_json_data()
-    initialize_session_state(df)
+    initialize_session_state(df, file_name)
     if 'data' in st.session_state and st.session_state['data'] is not None:
         df = st.session_state['data']
 
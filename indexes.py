@@ -0,0 +1,326 @@
+import bisect
+import itertools
+import pandas as pd
+from utils import is_valid_string
+
+IDENTIFIER_FIELDS = ["symbol", "isin", "cusip", "sedol", "api_id"]
+CASE_INSENSITIVE_FIELDS = ["symbol", "isin", "cusip", "sedol"]
+
+
+def _normalize_identifier(field, value):
+    """Return a comparable form of an identifier, or None if it is blank."""
+    if value is None or isinstance(value, bool) or not pd.api.types.is_scalar(value) or pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if not isinstance(value, str):
+        value = str(value)
+    if not is_valid_string(value):
+        return None
+    value = value.strip()
+    return value.upper() if field in CASE_INSENSITIVE_FIELDS else value
+
+
+def build_identifier_index(data):
+    """
+    Build a multi-key identifier index in a single pass over the data.
+
+    The index maps each identifier field to {identifier: set of dataset_ids}
+    under 'fields', each dataset_id to its identifiers under 'records', and
+    keeps the (field, identifier) keys shared by several records under
+    'duplicates'.
+    """
+    dataset_ids = data['dataset_id'].tolist()
+    index = {
+        'fields': {field: {} for field in IDENTIFIER_FIELDS},
+        'records': {doc_id: {} for doc_id in dataset_ids},
+        'duplicates': set(),
+    }
+    for field in IDENTIFIER_FIELDS:
+        if field not in data.columns:
+            continue
+        field_index = index['fields'][field]
+        for doc_id, value in zip(dataset_ids, data[field].tolist()):
+            value = _normalize_identifier(field, value)
+            if value is not None:
+                field_index.setdefault(value, set()).add(doc_id)
+                index['records'][doc_id][field] = value
+        index['duplicates'].update(
+            (field, value) for value, doc_ids in field_index.items() if len(doc_ids) > 1
+        )
+    return index
+
+
+def add_to_identifier_index(index, entry):
+    """Register the identifiers of a single record in the index."""
+    doc_id = entry['dataset_id']
+    identifiers = index['records'].setdefault(doc_id, {})
+    for field in IDENTIFIER_FIELDS:
+        value = _normalize_identifier(field, entry.get(field))
+        if value is not None:
+            doc_ids = index['fields'][field].setdefault(value, set())
+            doc_ids.add(doc_id)
+            identifiers[field] = value
+            if len(doc_ids) > 1:
+                index['duplicates'].add((field, value))
+
+
+def remove_from_identifier_index(index, doc_id):
+    """Remove the identifiers of a single record from the index."""
+    identifiers = index['records'].pop(doc_id, {})
+    for field, value in identifiers.items():
+        doc_ids = index['fields'][field].get(value)
+        if doc_ids is not None:
+            doc_ids.discard(doc_id)
+            if len(doc_ids) < 2:
+                index['duplicates'].discard((field, value))
+            if not doc_ids:
+                del index['fields'][field][value]
+
+
+def lookup_identifier(index, field, value):
+    """Return the dataset_ids of the records carrying the given identifier."""
+    value = _normalize_identifier(field, value)
+    if value is None:
+        return []
+    return sorted(index['fields'][field].get(value, ()))
+
+
+def find_duplicate_identifiers(index, limit=None):
+    """
+    Return identifiers shared by more than one record as a list of
+    (field, identifier, dataset_ids) tuples, at most `limit` of them.
+    """
+    return [(field, value, sorted(index['fields'][field][value]))
+            for field, value in itertools.islice(index['duplicates'], limit)]
+
+
+def _conflicting_fields(index, field, doc_ids):
+    """Return the other identifier fields on which the given records disagree."""
+    conflicting = []
+    for other_field in IDENTIFIER_FIELDS:
+        if other_field == field:
+            continue
+        values = {index['records'][doc_id].get(other_field) for doc_id in doc_ids}
+        values.discard(None)
+        if len(values) > 1:
+            conflicting.append(other_field)
+    return conflicting
+
+
+def find_conflicting_identifiers(index):
+    """
+    Return records that share one identifier but disagree on another, e.g. the
+    same ISIN with different CUSIPs, as a list of
+    (field, identifier, conflicting field, dataset_ids) tuples.
+    """
+    return [(field, identifier, other_field, doc_ids)
+            for field, identifier, doc_ids in find_duplicate_identifiers(index)
+            for other_field in _conflicting_fields(index, field, doc_ids)]
+
+
+def find_entry_collisions(index, doc_id):
+    """
+    Return the identifiers of a record that are also used by other records as
+    a list of (field, identifier, other dataset_ids) tuples.
+    """
+    collisions = []
+    for field, value in index['records'].get(doc_id, {}).items():
+        others = index['fields'][field].get(value, set()) - {doc_id}
+        if others:
+            collisions.append((field, value, sorted(others)))
+    return collisions
+
+
+def _format_doc_ids(doc_ids, limit=5):
+    shown = ', '.join(doc_ids[:limit])
+    if len(doc_ids) > limit:
+        shown += f" and {len(doc_ids) - limit} more"
+    return shown
+
+
+def format_collisions(collisions):
+    """Format collision tuples as markdown lines for display."""
+    return "\n".join(
+        f"- `{field}` **{value}** is used by: {_format_doc_ids(doc_ids)}"
+        for field, value, doc_ids in collisions
+    )
+
+
+def format_duplicates(index, limit=20):
+    """
+    Format at most `limit` duplicate identifiers as markdown lines, noting the
+    fields on which the records sharing them conflict.
+    """
+    lines = []
+    for field, value, doc_ids in find_duplicate_identifiers(index, limit):
+        line = f"- `{field}` **{value}** is used by: {_format_doc_ids(doc_ids)}"
+        conflicting = _conflicting_fields(index, field, doc_ids)
+        if conflicting:
+            line += f" (conflicting {', '.join(conflicting)})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _iter_alerts(doc_id, indicators):
+    """Yield (dataset_id, indicator position, alert position, alert) for a record."""
+    if not isinstance(indicators, list):
+        return
+    for ind_pos, indicator in enumerate(indicators):
+        for alert_pos, alert in enumerate(indicator.get('alerts') or []):
+            if alert:
+                yield doc_id, ind_pos, alert_pos, alert
+
+
+def _parse_expirations(alerts):
+    """
+    Parse the expirations of (dataset_id, indicator position, alert position,
+    alert) rows in one vectorized ISO 8601 call, retrying the non-ISO leftovers
+    with a lenient parse; unparseable values become NaT.
+    """
+    raws = pd.Series([alert.get('expiration') if isinstance(alert.get('expiration'), str) else None
+                      for _, _, _, alert in alerts], dtype=object)
+    parsed = pd.to_datetime(raws, errors='coerce', utc=True, format='ISO8601')
+    leftovers = parsed.isna() & raws.notna()
+    if leftovers.any():
+        parsed[leftovers] = pd.to_datetime(raws[leftovers], errors='coerce', utc=True, format='mixed')
+    return parsed
+
+
+def _register_alerts(index, alerts):
+    """Add (dataset_id, indicator position, alert position, alert) rows to the alert index."""
+    alerts = list(alerts)
+    new_entries = []
+    for (doc_id, ind_pos, alert_pos, alert), expiration in zip(alerts, _parse_expirations(alerts)):
+        if alert.get('open_ended', False):
+            index['open_ended'].setdefault(doc_id, []).append((ind_pos, alert_pos))
+            continue
+        if pd.isna(expiration):
+            index['unparseable'].setdefault(doc_id, []).append((ind_pos, alert_pos))
+            continue
+        key = (expiration.value, doc_id, ind_pos, alert_pos)
+        index['records'].setdefault(doc_id, []).append(key)
+        new_entries.append(key)
+    return new_entries
+
+
+def build_alert_index(data):
+    """
+    Build a time-ordered index over all alert expirations.
+
+    Every expiration string is parsed in a single vectorized call. Dated alerts
+    are kept as (expiration ns, dataset_id, indicator position, alert position)
+    keys in a sorted list; open-ended alerts are kept apart under 'open_ended'
+    and alerts without a parseable expiration under 'unparseable'.
+    """
+    index = {'entries': [], 'records': {}, 'open_ended': {}, 'unparseable': {}}
+    if 'indicators' not in data.columns:
+        return index
+    alerts = (
+        alert
+        for doc_id, indicators in zip(data['dataset_id'].tolist(), data['indicators'].tolist())
+        for alert in _iter_alerts(doc_id, indicators)
+    )
+    index['entries'] = sorted(_register_alerts(index, alerts))
+    return index
+
+
+def remove_alert_record(index, doc_id):
+    """Remove all alerts of a single record from the alert index."""
+    entries = index['entries']
+    for key in index['records'].pop(doc_id, []):
+        pos = bisect.bisect_left(entries, key)
+        if pos < len(entries) and entries[pos] == key:
+            del entries[pos]
+    index['open_ended'].pop(doc_id, None)
+    index['unparseable'].pop(doc_id, None)
+
+
+def reindex_alert_record(index, doc_id, indicators):
+    """Replace the alerts of a single record in the alert index."""
+    remove_alert_record(index, doc_id)
+    for key in _register_alerts(index, _iter_alerts(doc_id, indicators)):
+        bisect.insort(index['entries'], key)
+
+
+def _as_alerts(keys):
+    return [(pd.Timestamp(ns, tz='UTC'), doc_id, ind_pos, alert_pos)
+            for ns, doc_id, ind_pos, alert_pos in keys]
+
+
+def _now_ns(now):
+    return (pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)).value
+
+
+def expiring_alerts(index, days, now=None):
+    """
+    Return alerts expiring within the next `days` days as a list of
+    (expiration, dataset_id, indicator position, alert position) tuples.
+    """
+    start = _now_ns(now)
+    end = start + pd.Timedelta(days=days).value
+    entries = index['entries']
+    lo = bisect.bisect_left(entries, (start,))
+    hi = bisect.bisect_left(entries, (end + 1,))
+    return _as_alerts(entries[lo:hi])
+
+
+def expired_alerts(index, now=None):
+    """
+    Return alerts that have already expired as a list of
+    (expiration, dataset_id, indicator position, alert position) tuples.
+    """
+    entries = index['entries']
+    return _as_alerts(entries[:bisect.bisect_left(entries, (_now_ns(now),))])
+
+
+def open_ended_alerts(index):
+    """Return open-ended alerts as a list of (dataset_id, indicator position, alert position) tuples."""
+    return [(doc_id, ind_pos, alert_pos)
+            for doc_id, positions in index['open_ended'].items()
+            for ind_pos, alert_pos in positions]
+
+
+def unparseable_alerts(index):
+    """
+    Return alerts whose expiration could not be parsed as a list of
+    (dataset_id, indicator position, alert position) tuples.
+    """
+    return [(doc_id, ind_pos, alert_pos)
+            for doc_id, positions in index['unparseable'].items()
+            for ind_pos, alert_pos in positions]
+
+
+def purge_expired_alerts(data, index, now=None):
+    """
+    Drop expired alerts from the records in place, touching only the records
+    the alert index reports as holding expired alerts.
+
+    The alerts of those records are re-parsed, as the editor may have changed
+    them since they were indexed. Returns the number of alerts removed.
+    """
+    now_ns = _now_ns(now)
+    doc_ids = {doc_id for _, doc_id, _, _ in expired_alerts(index, now)}
+    if not doc_ids:
+        return 0
+    rows = data[data['dataset_id'].isin(doc_ids)]
+    removed = 0
+    records = {}
+    for doc_id, indicators in zip(rows['dataset_id'].tolist(), rows['indicators'].tolist()):
+        alerts = list(_iter_alerts(doc_id, indicators))
+        for (_, _, _, alert), expiration in zip(alerts, _parse_expirations(alerts)):
+            if not alert.get('open_ended', False) and pd.notna(expiration) and expiration.value < now_ns:
+                alert.clear()
+                removed += 1
+        if isinstance(indicators, list):
+            for indicator in indicators:
+                if 'alerts' in indicator:
+                    indicator['alerts'] = [alert for alert in indicator['alerts'] if alert]
+        # dataset_ids may repeat, so all rows of a record are reindexed together
+        records.setdefault(doc_id, []).append(indicators)
+    for doc_id in doc_ids:
+        remove_alert_record(index, doc_id)
+        alerts = [alert for indicators in records.get(doc_id, []) for alert in _iter_alerts(doc_id, indicators)]
+        for key in _register_alerts(index, alerts):
+            bisect.insort(index['entries'], key)
+    return removed
@@ -10,6 +10,24 @@ from datetime import date, datetime, timezone
 
 # from dataset import DatasetDocument
 from utils import is_valid_string, clean_alerts, convert_timestamp_to_iso
+from indexes import add_to_identifier_index, remove_from_identifier_index, find_entry_collisions, \
+    reindex_alert_record, remove_alert_record, purge_expired_alerts
+
+
+def refresh_identifier_index(entry):
+    """
+    Re-registers a record in the identifier index and flags any
+    identifiers it now shares with other records.
+    """
+    index = st.session_state.get('identifier_index')
+    if index is None:
+        return
+    remove_from_identifier_index(index, entry['dataset_id'])
+    add_to_identifier_index(index, entry)
+    if find_entry_collisions(index, entry['dataset_id']):
+        st.session_state['identifier_collision_id'] = entry['dataset_id']
+    else:
+        st.session_state.pop('identifier_collision_id', None)
 
 
 def add_new_entry(data):
@@ -50,6 +68,7 @@ def add_new_entry(data):
     new_record['start_date'] = pd.to_datetime(new_record['start_date'])
     data = pd.concat([new_record, data], ignore_index=True)
     st.session_state['data'] = data
+    refresh_identifier_index(blank_entry)
     st.success('New entry added successfully with default values!')
     return data
 
@@ -115,6 +134,9 @@ def update_json_entry(data, document_id):
 
     # Update the dataframe
     data.loc[row_index] = updated_entry
+    refresh_identifier_index(updated_entry)
+    if 'alert_index' in st.session_state:
+        reindex_alert_record(st.session_state['alert_index'], document_id, updated_entry['indicators'])
 
     # Save the updated data in session state to persist changes
     st.session_state['data'] = data.copy()
@@ -128,9 +150,28 @@ def update_json_entry(data, document_id):
 def drop_entry(data, doc_id):
     data = data[data['dataset_id'] != doc_id]
     st.session_state['data'] = data
+    if 'identifier_index' in st.session_state:
+        remove_from_identifier_index(st.session_state['identifier_index'], doc_id)
+    if st.session_state.get('identifier_collision_id') == doc_id:
+        del st.session_state['identifier_collision_id']
+    if 'alert_index' in st.session_state:
+        remove_alert_record(st.session_state['alert_index'], doc_id)
     st.rerun()
 
 
+def purge_alerts(data):
+    """
+    Drop all expired alerts using the alert expiration index.
+    """
+    if data is None or 'alert_index' not in st.session_state:
+        return data
+    removed = purge_expired_alerts(data, st.session_state['alert_index'])
+    st.session_state['data'] = data
+    # Shown on the next run, as the caller reruns the app straight away
+    st.session_state['alert_purge_message'] = f'{removed} expired alert(s) removed.'
+    return data
+
+
 def save_json(file_name, data):
     if data is not None:
         # st.write(data)
@@ -5,10 +5,14 @@ import uuid
 import pandas as pd
 import streamlit as st
 from datetime import date, datetime, timezone
-from operations import save_json, drop_entry, add_new_entry, update_json_entry
+from operations import save_json, drop_entry, add_new_entry, update_json_entry, purge_alerts
 from utils import is_valid_string
+from indexes import IDENTIFIER_FIELDS, lookup_identifier, find_entry_collisions, format_collisions, format_duplicates, \
+    expiring_alerts, expired_alerts, open_ended_alerts, unparseable_alerts
 
 
+MAX_REPORTED_DUPLICATES = 20
+
 def data_loader():
     """Loads in file by providing a file uploading widget."""
     try:
@@ -39,7 +43,8 @@ def load_json_data():
     if file:
         try:
             # Try to read the file as JSON
-            data = pd.read_json(file)
+            # Keep CUSIPs/SEDOLs as read so all-digit codes retain leading zeros
+            data = pd.read_json(file, dtype={'cusip': False, 'sedol': False})
             try:
                 # Try to parse 'start_date' to datetime
                 data['start_date'] = pd.to_datetime(data['start_date'])
@@ -296,7 +301,71 @@ def display_filters(data):
 
 
 
+def display_identifier_warnings():
+    """
+    Shows the current duplicate/conflicting identifiers and the collision
+    introduced by the latest edit, if any.
+    """
+    index = st.session_state.get('identifier_index')
+    if index is None:
+        return
+    duplicates = len(index['duplicates'])
+    if duplicates:
+        with st.expander(label=f"⚠️ Identifier issues ({duplicates} duplicate identifier(s))"):
+            st.warning(format_duplicates(index, limit=MAX_REPORTED_DUPLICATES))
+            if duplicates > MAX_REPORTED_DUPLICATES:
+                st.caption(f"... and {duplicates - MAX_REPORTED_DUPLICATES} more.")
+    collision_id = st.session_state.get('identifier_collision_id')
+    if collision_id is not None:
+        collisions = find_entry_collisions(index, collision_id)
+        if collisions:
+            st.warning(f"Identifier collision on {collision_id}:\n{format_collisions(collisions)}")
+
+
+def display_identifier_lookup():
+    """Sidebar lookup of the record(s) carrying a given identifier."""
+    index = st.session_state.get('identifier_index')
+    if index is None:
+        return
+    st.sidebar.write("##### Identifier Lookup")
+    field = st.sidebar.selectbox(label="Identifier", options=IDENTIFIER_FIELDS, key='lookup_field')
+    value = st.sidebar.text_input(label="Value", key='lookup_value')
+    if is_valid_string(value):
+        doc_ids = lookup_identifier(index, field, value)
+        if doc_ids:
+            st.sidebar.write("\n".join(f"- {doc_id}" for doc_id in doc_ids))
+        else:
+            st.sidebar.info(f"No record has {field} '{value}'.")
+
+
+def display_alert_expirations(data):
+    """Sidebar overview of alert expirations with a bulk purge of expired alerts."""
+    index = st.session_state.get('alert_index')
+    if index is None:
+        return
+    st.sidebar.write("##### Alert Expirations")
+    if 'alert_purge_message' in st.session_state:
+        st.sidebar.success(st.session_state.pop('alert_purge_message'))
+    days = st.sidebar.number_input(label="Expiring within (days)", min_value=0, value=7, key='alert_expiry_days')
+    upcoming = expiring_alerts(index, days)
+    expired = expired_alerts(index)
+    open_ended = open_ended_alerts(index)
+    unparseable = unparseable_alerts(index)
+    st.sidebar.write(f"Upcoming: {len(upcoming)} | Expired: {len(expired)} | Open-ended: {len(open_ended)}")
+    if unparseable:
+        st.sidebar.warning(f"{len(unparseable)} alert(s) have no readable expiration date.")
+    if upcoming:
+        with st.sidebar.expander(label="Upcoming expirations"):
+            st.write("\n".join(f"- {expiration.date()} · {doc_id}" for expiration, doc_id, _, _ in upcoming))
+    if expired and st.sidebar.button("Purge expired alerts"):
+        purge_alerts(data)
+        st.rerun()
+
+
 def display_data_editor(data):
+    display_identifier_warnings()
+    display_identifier_lookup()
+    display_alert_expirations(data)
     data = display_filters(data)
     add = st.columns(8)[7].button(label="➕", help="Add new entry to the data.")
     if add: